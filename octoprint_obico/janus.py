@@ -1,13 +1,13 @@
 import os
 import logging
 import subprocess
-import time
+import signal
+import functools
 
 from threading import Thread
 import backoff
 import json
 import socket
-import psutil
 from octoprint.util import to_unicode
 
 try:
@@ -15,25 +15,44 @@ try:
 except ImportError:
     import Queue as queue
 
-from .utils import ExpoBackoff, pi_version, is_port_open, wait_for_port, wait_for_port_to_close, run_in_thread
+from .utils import ExpoBackoff, pi_version, is_port_open, wait_for_port_while_alive, wait_for_port_to_close, run_in_thread
 from .ws import WebSocketClient
 from .lib import alert_queue
 from .janus_config_builder import RUNTIME_JANUS_ETC_DIR
 
 _logger = logging.getLogger('octoprint.plugins.obico')
 
-JANUS_WS_PORT = 17730   # Janus needs to use 17730 up to 17750. Hard-coded for now. may need to make it dynamic if the problem of port conflict is too much
-
+JANUS_BASE_WS_PORT = 17730   # Janus needs to use 17730 up to 17750. Hard-coded for now. may need to make it dynamic if the problem of port conflict is too much
+
+JANUS_PID_FILE_PATH_TEMPLATE = '/tmp/obico-janus-{janus_port}.pid'
+
+def janus_port_in_use(janus_port):
+    try:
+        with open(JANUS_PID_FILE_PATH_TEMPLATE.format(janus_port=janus_port), 'r') as pid_file:
+            os.kill(int(pid_file.read().strip()), 0)  # Signal 0 only checks if the process exists
+        return True
+    except (FileNotFoundError, ProcessLookupError, ValueError):  # No pid file, or a stale one left behind by a dead Janus process
+        return False
+    except OSError:  # Process exists but is owned by another user, or the pid file can't be read. Don't take the port either way
+        return True
+
+# Not done at import time so that it costs nothing until Janus is actually used.
+@functools.lru_cache(maxsize=1)
+def janus_ws_port():
+    janus_port = JANUS_BASE_WS_PORT
+    # Make sure the port is available in case there are multiple obico instances running
+    for i in range(0, 100):
+        if not janus_port_in_use(janus_port):
+            break
+        janus_port += 20 # 20 is a big-enough gap for all ports needed for 1 octoprint instance.
+    return janus_port
+
+def janus_admin_ws_port():
+    return janus_ws_port() + 1
+
+@functools.lru_cache(maxsize=1)
 def janus_pid_file_path():
-    global JANUS_WS_PORT
-    return '/tmp/obico-janus-{janus_port}.pid'.format(janus_port=JANUS_WS_PORT)
-
-# Make sure the port is available in case there are multiple obico instances running
-for i in range(0, 100):
-    if os.path.exists(janus_pid_file_path()):
-        JANUS_WS_PORT += 20 # 20 is a big-enough gap for all ports needed for 1 octoprint instance.
-
-JANUS_ADMIN_WS_PORT = JANUS_WS_PORT + 1
+    return JANUS_PID_FILE_PATH_TEMPLATE.format(janus_port=janus_ws_port())
 
 class JanusConn:
 
@@ -45,31 +64,47 @@ class JanusConn:
 
     def start(self, janus_bin_path, ld_lib_path):
 
-        def run_janus_forever():
+        def run_janus_forever(janus_proc):
             try:
-                janus_cmd = '{janus_bin_path} --stun-server=stun.l.google.com:19302 --configs-folder {config_folder}'.format(janus_bin_path=janus_bin_path, config_folder=RUNTIME_JANUS_ETC_DIR)
-                env = {}
-                if ld_lib_path:
-                    env={'LD_LIBRARY_PATH': ld_lib_path + ':' + os.environ.get('LD_LIBRARY_PATH', '')}
-                _logger.debug('Popen: {} {}'.format(env, janus_cmd))
-                janus_proc = subprocess.Popen(janus_cmd.split(), env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-
-                with open(janus_pid_file_path(), 'w') as pid_file:
-                    pid_file.write(str(janus_proc.pid))
-
+                partial_line = b''
                 while True:
-                    line = to_unicode(janus_proc.stdout.readline(), errors='replace')
-                    if line:
-                        _logger.debug('JANUS: ' + line.rstrip())
-                    else:  # line == None means the process quits
-                        _logger.warn('Janus quit with exit code {}'.format(janus_proc.wait()))
+                    chunk = janus_proc.stdout.read1(65536)  # Whatever is available, so that verbose output is not read 1 line at a time
+                    if not chunk:  # EOF means the process quits
+                        if partial_line and _logger.isEnabledFor(logging.DEBUG):  # Last output without a trailing newline, often the reason Janus quit
+                            _logger.debug('JANUS: %s', to_unicode(partial_line, errors='replace').rstrip())
+                        _logger.warn('Janus quit with exit code %s', janus_proc.wait())
                         return
+
+                    if not _logger.isEnabledFor(logging.DEBUG):
+                        partial_line = b''
+                        continue
+
+                    lines = (partial_line + chunk).split(b'\n')
+                    partial_line = lines.pop()
+                    for line in lines:
+                        _logger.debug('JANUS: %s', to_unicode(line, errors='replace').rstrip())
             except Exception as ex:
                 self.plugin.sentry.captureException()
 
+        janus_cmd = [janus_bin_path, '--stun-server=stun.l.google.com:19302', '--configs-folder', RUNTIME_JANUS_ETC_DIR]  # List form so that paths with spaces are passed intact
+        env = {}
+        if ld_lib_path:
+            env={'LD_LIBRARY_PATH': ld_lib_path + ':' + os.environ.get('LD_LIBRARY_PATH', '')}
+
         self.kill_janus_if_running()
-        run_in_thread(run_janus_forever)
-        self.wait_for_janus()
+
+        try:
+            _logger.debug('Popen: %s %s', env, janus_cmd)
+            janus_proc = subprocess.Popen(janus_cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+            with open(janus_pid_file_path(), 'w') as pid_file:
+                pid_file.write(str(janus_proc.pid))
+        except Exception as ex:
+            self.plugin.sentry.captureException()
+            return
+
+        run_in_thread(run_janus_forever, janus_proc)
+        self.wait_for_janus(janus_proc.pid)
         self.start_janus_ws()
 
     def connected(self):
@@ -79,9 +114,9 @@ class JanusConn:
         if self.connected():
             self.janus_ws.send(msg)
 
-    def wait_for_janus(self):
-        time.sleep(0.2)
-        wait_for_port(self.janus_server, JANUS_WS_PORT)
+    def wait_for_janus(self, janus_pid):
+        if not wait_for_port_while_alive(self.janus_server, janus_ws_port(), janus_pid):
+            _logger.warning('Janus did not open port %s', janus_ws_port())
 
     def start_janus_ws(self):
 
@@ -89,7 +124,7 @@ class JanusConn:
             _logger.warn('Janus WS connection closed!')
 
         self.janus_ws = WebSocketClient(
-            'ws://{}:{}/'.format(self.janus_server, JANUS_WS_PORT),
+            'ws://{}:{}/'.format(self.janus_server, janus_ws_port()),
             on_ws_msg=self.process_janus_msg,
             on_ws_close=on_close,
             subprotocols=['janus-protocol'],
@@ -100,10 +135,12 @@ class JanusConn:
             # It is possible that orphaned janus process is running (maybe previous python process was killed -9?).
             # Ensure the process is killed before launching a new one
             with open(janus_pid_file_path(), 'r') as pid_file:
-                subprocess.run(['kill', pid_file.read()], check=True)
-            wait_for_port_to_close(self.janus_server, JANUS_WS_PORT)
+                os.kill(int(pid_file.read().strip()), signal.SIGTERM)
+            wait_for_port_to_close(self.janus_server, janus_ws_port())
+        except (FileNotFoundError, ProcessLookupError):
+            pass
         except Exception as e:
-            _logger.warning('Failed to shutdown Janus - ' + str(e))
+            _logger.warning('Failed to shutdown Janus - %s', e)
 
         try:
             os.remove(janus_pid_file_path())
@@ -121,10 +158,13 @@ class JanusConn:
         self.kill_janus_if_running()
 
     def process_janus_msg(self, ws, raw_msg):
+        if _logger.isEnabledFor(logging.DEBUG):  # Parsing is only needed for the log. raw_msg is relayed as is
+            try:
+                _logger.debug('Relaying Janus msg %s', json.loads(raw_msg))
+            except:
+                pass
+
         try:
-            msg = json.loads(raw_msg)
-            _logger.debug('Relaying Janus msg')
-            _logger.debug(msg)
             self.plugin.send_ws_msg_to_server(dict(janus=raw_msg))
         except:
             self.plugin.sentry.captureException()
@@ -15,6 +15,8 @@ from io import BytesIO
 import struct
 import threading
 import socket
+import selectors
+import errno
 from contextlib import closing
 import backoff
 import octoprint
@@ -259,7 +261,7 @@ def get_image_info(data):
 
 
 def is_port_open(host, port):
-    _logger.debug(f'Testing TCP port {port} on {host}')
+    _logger.debug('Testing TCP port %s on %s', port, host)
     with closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as sock:
         return sock.connect_ex((host, port)) == 0
 
@@ -270,6 +272,50 @@ def wait_for_port(host, port):
     return is_port_open(host, port)
 
 
+def wait_for_port_while_alive(host, port, pid, timeout=15):  # Same limit as wait_for_port (5 expo tries: 1+2+4+8s)
+    '''
+    Wait for the process (pid) that is supposed to listen on a TCP port to open it.
+    Return: True if the port is open. False if the process quits or the wait times out.
+    '''
+    try:
+        pidfd = os.pidfd_open(pid)  # Linux >= 5.3 and Python >= 3.9. The pidfd becomes readable when the process quits.
+    except ProcessLookupError:
+        return False
+    except (AttributeError, OSError):
+        return wait_for_port(host, port)
+
+    deadline = time.monotonic() + timeout
+    try:
+        with closing(selectors.DefaultSelector()) as selector:
+            selector.register(pidfd, selectors.EVENT_READ)
+
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+
+                with closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as sock:
+                    sock.setblocking(False)
+                    err = sock.connect_ex((host, port))
+                    if err in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+                        selector.register(sock, selectors.EVENT_WRITE)
+                        ready = [key.fileobj for (key, _) in selector.select(timeout=remaining)]
+                        selector.unregister(sock)
+                        if pidfd in ready:
+                            return False
+                        if sock in ready:
+                            err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+
+                if err == 0:
+                    return True
+
+                # Port is not open yet. Retry shortly, but wake up right away if the process quits.
+                if selector.select(timeout=min(0.1, max(deadline - time.monotonic(), 0))):
+                    return False
+    finally:
+        os.close(pidfd)
+
+
 def wait_for_port_to_close(host, port):
     for i in range(10):   # Wait for up to 5s
         with closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as sock:
@@ -26,7 +26,6 @@ import socket
 import errno
 import base64
 from textwrap import wrap
-import psutil
 from octoprint.util import to_unicode
 import octoprint
 
@@ -34,7 +33,7 @@ from .utils import pi_version, ExpoBackoff, get_image_info, parse_integer_or_non
 from .lib import alert_queue
 from .webcam_capture import capture_jpeg, webcam_full_url
 from .janus_config_builder import build_janus_config
-from .janus import JanusConn, JANUS_WS_PORT, JANUS_ADMIN_WS_PORT
+from .janus import JanusConn, janus_ws_port, janus_admin_ws_port
 
 
 _logger = logging.getLogger('octoprint.plugins.obico')
@@ -223,7 +222,7 @@ class WebcamStreamer:
             self.assign_janus_params()
 
             try:
-                (janus_bin_path, ld_lib_path) = build_janus_config(self.webcams, self.plugin.auth_token(), JANUS_WS_PORT, JANUS_ADMIN_WS_PORT)
+                (janus_bin_path, ld_lib_path) = build_janus_config(self.webcams, self.plugin.auth_token(), janus_ws_port(), janus_admin_ws_port())
                 if not janus_bin_path:
                     _logger.error('Janus not found or not configured correctly. Quiting webcam streaming.')
                     self.send_streaming_failed_event()
@@ -306,7 +305,7 @@ class WebcamStreamer:
             first_mjpeg_webcam['runtime']['stream_id'] = 2  # Set janus id to 2 for the first mjpeg stream to be compatible with old mobile app versions
 
         cur_stream_id = 3
-        cur_port_num = JANUS_ADMIN_WS_PORT + 1
+        cur_port_num = janus_admin_ws_port() + 1
         for webcam in self.webcams:
             if 'runtime' not in webcam:
                 webcam['runtime'] = {}